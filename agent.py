@@ -1,40 +1,92 @@
 import pandas as pd
-from langchain_experimental.agents.agent_toolkits import create_pandas_dataframe_agent
-from langchain_groq import ChatGroq
 from typing import Optional, Dict
+from collections import OrderedDict
+from functools import lru_cache
 import re
 
 
+# Precompiled normalization patterns. normalize_query runs on every user
+# query, so compiling these once at import time avoids rebuilding the same
+# regex state machines on each call.
+_HOW_MANY_GROUPED = re.compile(r'^how many (\w+) in each (\w+)')
+_HOW_MUCH = re.compile(r'^how much is the (total|average|sum|mean) (\w+)')
+_WHAT_CALC = re.compile(r'^what is the (average|sum|total|mean|median|max|min|maximum|minimum) (?:of )?(\w+)')
+_WHAT_ARE = re.compile(r'^what are the (\w+)')
+_WHERE = re.compile(r'^where (?:is|are) (\w+)')
+_CAN_YOU = re.compile(r'^can you (show|give|get|find|display) (?:me )?(.+)')
+_I_WANT = re.compile(r'^i want to (see|know|find|get) (.+)')
+_PATTERNS_MAX_MIN = [
+    (re.compile(r'^(?:which|who|what)\s+(?:has|have)\s+(?:the\s+)?highest\s+(\w+)'), r'show the row where \1 is maximum'),
+    (re.compile(r'^(?:which|who|what)\s+(?:has|have)\s+(?:the\s+)?lowest\s+(\w+)'), r'show the row where \1 is minimum'),
+    (re.compile(r'^(?:which|who|what)\s+(?:has|have)\s+(?:the\s+)?max\s+(\w+)'), r'show the row where \1 is maximum'),
+    (re.compile(r'^(?:which|who|what)\s+(?:has|have)\s+(?:the\s+)?min\s+(\w+)'), r'show the row where \1 is minimum'),
+]
+_TOP_N = re.compile(r'^top\s+(\d+)\s+(?:by\s+)?(\w+)')
+_SORT_TOP_N = re.compile(r'^sort\s+(?:the\s+)?top\s+(\d+)\s+(?:by|rows by)\s+(\w+)')
+_DEPT = re.compile(r'^(\w+)\s+(?:department|employees|workers)')
+_NAME_TOKEN = re.compile(r'[a-zA-Z0-9]+')
+
+# Leading action words: testing the first token against a frozenset is one
+# O(1) lookup instead of a startswith scan per word
+_ACTION_WORDS = frozenset({'show', 'display', 'get', 'find', 'calculate', 'list', 'count'})
+_STRUCTURE_WORDS = ('sort', 'filter', 'where', 'group')
+_DATA_REQUEST_WORDS = ('show', 'display', 'get', 'find', 'sort', 'filter', 'calculate')
+
+# Leading-prefix rewrites keyed by the first one or two words of the query.
+# A single dict lookup replaces a chain of startswith + replace calls that
+# each rescanned the full string. Handlers get the text after the prefix and
+# may return None to leave the query unchanged.
+_PREFIX_HANDLERS = {
+    'how many ': lambda rest: f"count total number of {rest.strip()}",
+    'tell me ': lambda rest: f"show {rest}",
+    'give me ': lambda rest: f"show {rest}",
+    'average ': lambda rest: f"calculate the average of {rest}" if rest and ' ' not in rest else None,
+}
+
+
+@lru_cache(maxsize=512)
 def normalize_query(question: str) -> str:
     """
     Normalize user queries to improve LLM understanding.
     Handles common patterns and informal phrasings.
+    Pure function, so results are memoized -- the UI and the agent both
+    normalize the same question on every analyze click.
     """
     question = question.strip()
     question_lower = question.lower()
     
     # Pattern 0: "How many X in each Y" -> "count X in each Y"
-    how_many_grouped = r'^how many (\w+) in each (\w+)'
-    match = re.match(how_many_grouped, question_lower)
+    match = _HOW_MANY_GROUPED.match(question_lower)
     if match:
         item, group = match.groups()
         question = f"count {item} in each {group}"
-    
-    # Pattern 0b: "How many X" -> "count total number of X"
-    elif question_lower.startswith('how many '):
-        item = question_lower.replace('how many ', '').strip()
-        question = f"count total number of {item}"
-    
+
+    # Patterns 0b/0i/0j/4: dispatch on the leading one- or two-word prefix
+    # ("how many", "tell me", "give me", "average")
+    else:
+        first_space = question_lower.find(' ')
+        if first_space != -1:
+            second_space = question_lower.find(' ', first_space + 1)
+            handler = None
+            if second_space != -1:
+                handler = _PREFIX_HANDLERS.get(question_lower[:second_space + 1])
+                rest = question_lower[second_space + 1:]
+            if handler is None:
+                handler = _PREFIX_HANDLERS.get(question_lower[:first_space + 1])
+                rest = question_lower[first_space + 1:]
+            if handler is not None:
+                rewritten = handler(rest)
+                if rewritten is not None:
+                    question = rewritten
+
     # Pattern 0c: "How much is the total/average/sum X" -> "calculate total/average/sum of X"
-    how_much_pattern = r'^how much is the (total|average|sum|mean) (\w+)'
-    match = re.match(how_much_pattern, question_lower)
+    match = _HOW_MUCH.match(question_lower)
     if match:
         operation, column = match.groups()
         question = f"calculate the {operation} of {column}"
     
     # Pattern 0d: "What is the average/sum/total/mean of X" -> "calculate average of X"
-    what_calc_pattern = r'^what is the (average|sum|total|mean|median|max|min|maximum|minimum) (?:of )?(\w+)'
-    match = re.match(what_calc_pattern, question_lower)
+    match = _WHAT_CALC.match(question_lower)
     if match:
         operation, column = match.groups()
         if operation in ['max', 'maximum']:
@@ -45,79 +97,50 @@ def normalize_query(question: str) -> str:
             question = f"calculate the {operation} of {column}"
     
     # Pattern 0e: "What are the X" -> "show unique values in X column"
-    what_are_pattern = r'^what are the (\w+)'
-    match = re.match(what_are_pattern, question_lower)
+    match = _WHAT_ARE.match(question_lower)
     if match and 'unique' not in question_lower:
         column = match.group(1)
         question = f"show unique values in {column} column"
     
     # Pattern 0f: "Where is/are X" -> "show rows where"
-    where_pattern = r'^where (?:is|are) (\w+)'
-    match = re.match(where_pattern, question_lower)
+    match = _WHERE.match(question_lower)
     if match:
         condition = question_lower.replace('where is ', '').replace('where are ', '')
         question = f"show rows where {condition}"
     
     # Pattern 0g: "Can you show/give/get me X" -> "show X"
-    can_you_pattern = r'^can you (show|give|get|find|display) (?:me )?(.+)'
-    match = re.match(can_you_pattern, question_lower)
+    match = _CAN_YOU.match(question_lower)
     if match:
         action, rest = match.groups()
         question = f"{action} {rest}"
     
     # Pattern 0h: "I want to see/know X" -> "show X"
-    i_want_pattern = r'^i want to (see|know|find|get) (.+)'
-    match = re.match(i_want_pattern, question_lower)
+    match = _I_WANT.match(question_lower)
     if match:
         _, rest = match.groups()
         question = f"show {rest}"
     
-    # Pattern 0i: "Tell me X" -> "show X"
-    if question_lower.startswith('tell me '):
-        rest = question_lower.replace('tell me ', '')
-        question = f"show {rest}"
-    
-    # Pattern 0j: "Give me X" -> "show X"
-    if question_lower.startswith('give me '):
-        rest = question_lower.replace('give me ', '')
-        question = f"show {rest}"
-    
     # Pattern 1: "which/who has/have [highest/lowest/max/min] X" -> "show row where X is maximum/minimum"
-    patterns_max_min = [
-        (r'^(?:which|who|what)\s+(?:has|have)\s+(?:the\s+)?highest\s+(\w+)', r'show the row where \1 is maximum'),
-        (r'^(?:which|who|what)\s+(?:has|have)\s+(?:the\s+)?lowest\s+(\w+)', r'show the row where \1 is minimum'),
-        (r'^(?:which|who|what)\s+(?:has|have)\s+(?:the\s+)?max\s+(\w+)', r'show the row where \1 is maximum'),
-        (r'^(?:which|who|what)\s+(?:has|have)\s+(?:the\s+)?min\s+(\w+)', r'show the row where \1 is minimum'),
-    ]
-    
-    for pattern, replacement in patterns_max_min:
-        match = re.match(pattern, question_lower)
+    for pattern, replacement in _PATTERNS_MAX_MIN:
+        match = pattern.match(question_lower)
         if match:
-            question = re.sub(pattern, replacement, question_lower, flags=re.IGNORECASE)
+            question = pattern.sub(replacement, question_lower)
             break
-    
+
     # Pattern 2: "top N [by] X" -> "sort by X descending and show first N rows"
-    top_pattern = r'^top\s+(\d+)\s+(?:by\s+)?(\w+)'
-    match = re.match(top_pattern, question_lower)
+    match = _TOP_N.match(question_lower)
     if match:
         n, column = match.groups()
         question = f"sort by {column} descending and show first {n} rows"
     
     # Pattern 3: "sort [the] top N by X" -> "sort by X descending and show first N rows"
-    sort_top_pattern = r'^sort\s+(?:the\s+)?top\s+(\d+)\s+(?:by|rows by)\s+(\w+)'
-    match = re.match(sort_top_pattern, question_lower)
+    match = _SORT_TOP_N.match(question_lower)
     if match:
         n, column = match.groups()
         question = f"sort by {column} descending and show first {n} rows"
     
-    # Pattern 4: Just a column name or "average X" -> "calculate average of X"
-    if question_lower.startswith('average ') and len(question.split()) == 2:
-        column = question.split()[1]
-        question = f"calculate the average of {column}"
-    
     # Pattern 5: "X department" or "X employees" -> "show rows where department equals X"
-    dept_pattern = r'^(\w+)\s+(?:department|employees|workers)'
-    match = re.match(dept_pattern, question_lower)
+    match = _DEPT.match(question_lower)
     if match and not question_lower.startswith('show'):
         dept = match.group(1)
         question = f"show all rows where department equals {dept}"
@@ -131,9 +154,8 @@ def normalize_query(question: str) -> str:
         question = "show the row where performance_score is maximum"
     
     # Pattern 7: Add "show" if query starts with a sorting/filtering word but no action
-    action_words = ['show', 'display', 'get', 'find', 'calculate', 'list', 'count']
-    if not any(question_lower.startswith(word) for word in action_words):
-        if any(word in question_lower for word in ['sort', 'filter', 'where', 'group']):
+    if question_lower.split(' ', 1)[0] not in _ACTION_WORDS:
+        if any(word in question_lower for word in _STRUCTURE_WORDS):
             question = f"show {question}"
     
     # Pattern 8: Replace common abbreviations
@@ -150,80 +172,338 @@ def normalize_query(question: str) -> str:
     return question
 
 
+# Max number of LLM answers remembered per agent (see query result cache).
+_QUERY_CACHE_SIZE = 64
+
+_AGG_OPS = {'average': 'mean', 'mean': 'mean', 'sum': 'sum', 'median': 'median', 'max': 'max', 'min': 'min'}
+
+
+def _fast_aggregate(df, match):
+    operation, column = match.groups()
+    if column not in df.columns:
+        return None
+    try:
+        return getattr(df[column], _AGG_OPS[operation])()
+    except (TypeError, ValueError):
+        return None  # non-numeric column: let the agent handle it
+
+
+def _fast_extreme_row(df, match):
+    column, direction = match.groups()
+    if column not in df.columns:
+        return None
+    try:
+        idx = df[column].idxmax() if direction == 'maximum' else df[column].idxmin()
+    except (TypeError, ValueError):
+        return None  # all-NaN or unordered column: let the agent handle it
+    return df.loc[idx]
+
+
+# Queries that are deterministic after normalization. Each handler answers
+# directly from the dataframe (no LLM round-trip) or returns None to fall
+# through to the agent, e.g. when the column doesn't exist.
+_FAST_PATHS = [
+    (re.compile(r'^show first (\d+) rows$'), lambda df, m: df.head(int(m.group(1)))),
+    (re.compile(r'^show all rows$'), lambda df, m: df),
+    (re.compile(r'^count total number of rows$'), lambda df, m: len(df)),
+    (re.compile(r'^calculate the (average|mean|sum|median|max|min) of (\w+)$'), _fast_aggregate),
+    (re.compile(r'^show the row where (\w+) is (maximum|minimum)$'), _fast_extreme_row),
+]
+
+
+# System prompt for the pandas agent. Module-level constant so it isn't
+# re-allocated every time a new dataframe is bound. Kept deliberately short:
+# every query pays tokenization and inference cost for this text, so it is
+# one contract sentence, one canonical example and one output rule.
+_AGENT_PREFIX = """You are working with a pandas dataframe in Python named `df`. Answer every question by executing pandas code with the python_repl_ast tool and returning the result.
+
+Example:
+User: "show first 5 rows"
+Action: python_repl_ast
+Action Input: df.head(5)
+Final Answer: [the dataframe returned by the tool]
+
+Your Final Answer must be the actual object the code produced (dataframe, series or number) - never a prose description, print() output or str() of it."""
+
+
 class DataAnalysisAgent:
     """
     Wrapper around LangChain pandas dataframe agent.
     Uses Groq's Llama-3.3-70B model for natural language queries.
     """
-    
+
     def __init__(self, api_key: str, model_name: str = "llama-3.3-70b-versatile"):
         self.api_key = api_key
         self.model_name = model_name
         self.agent = None
         self.df = None
-    
+        self._llm = None
+        self._schema_lines = {}
+        self._column_tokens = {}
+        self._df_fp = None
+        self._cache = OrderedDict()
+        self.last_result = None
+
     def initialize_agent(self, df: pd.DataFrame):
         """
-        Create the pandas agent with the provided dataframe.
+        Bind the pandas agent to the provided dataframe.
+        The LLM client is invariant across dataframes, so it is created
+        once and reused; only the dataframe wrapper is rebuilt.
         """
+        # Imported here rather than at module scope so users who only
+        # preview CSVs never pay the LangChain import cost
+        from langchain_experimental.agents.agent_toolkits import create_pandas_dataframe_agent
+        from langchain_groq import ChatGroq
+
         self.df = df
-        
-        llm = ChatGroq(
-            temperature=0,
-            model_name=self.model_name,
-            groq_api_key=self.api_key
-        )
-        
-        # Create agent with error handling and iteration limits
+
+        # Precompute a one-line schema per column (name, dtype, one sample)
+        # so queries can inline it instead of the agent spending a tool call
+        # on df.head() to discover the columns.
+        self._schema_lines = {}
+        self._column_tokens = {}
+        for col in df.columns:
+            sample = df[col].iloc[0] if len(df) else None
+            self._schema_lines[col] = f"{col}: {df[col].dtype} e.g. {sample!r}"
+            self._column_tokens[col] = set(_NAME_TOKEN.findall(str(col).lower()))
+
+        # Cheap schema fingerprint (shape + columns + dtypes, not contents)
+        # used to key the query result cache across dataframe rebinds.
+        self._df_fp = hash((df.shape, tuple(df.columns), tuple(str(t) for t in df.dtypes)))
+
+        if self._llm is None:
+            self._llm = ChatGroq(
+                temperature=0,
+                model_name=self.model_name,
+                groq_api_key=self.api_key,
+                streaming=True  # Groq SSE streaming, consumed by stream()
+            )
+
+        # Create agent with error handling and iteration limits. Tabular
+        # queries almost always resolve in 1-2 steps; each extra round-trip
+        # is another ~10s LLM call, so cap hard. The default "force" stop
+        # emits an 'Agent stopped' answer that query() rewrites into a
+        # friendlier message ("generate" is not supported by the runnable
+        # agent this builds and raises at the cap).
         self.agent = create_pandas_dataframe_agent(
-            llm,
+            self._llm,
             df,
             verbose=True,
             agent_type="zero-shot-react-description",
             handle_parsing_errors=True,
-            max_iterations=10,
+            max_iterations=3,
+            max_execution_time=15,
+            return_intermediate_steps=True,  # keeps the raw tool output around
             allow_dangerous_code=True,  # Required for code execution
-            prefix="""You are working with a pandas dataframe in Python named `df`. 
-
-CRITICAL INSTRUCTIONS:
-1. When asked to SHOW, DISPLAY, GET, or FIND data - you MUST return the actual dataframe/data using the python_repl_ast tool
-2. NEVER just describe what you would do - ALWAYS execute the code and return results
-3. ALWAYS use python_repl_ast to run code that returns the data
-4. Your final answer MUST be the actual data (dataframe, number, series), NOT a string description
-5. Use df.head(), df.tail(), df.sort_values(), df[...], etc. to return actual pandas objects
-6. DO NOT use print() or str() - just return the dataframe/value directly
-
-EXAMPLES OF CORRECT BEHAVIOR:
-User: "show first 5 rows"
-You: Action: python_repl_ast
-Action Input: df.head(5)
-Observation: [actual dataframe returned]
-Final Answer: [return the dataframe object, not str(dataframe)]
-
-User: "calculate average salary"  
-You: Action: python_repl_ast
-Action Input: df['salary'].mean()
-Observation: 81266.67
-Final Answer: 81266.67
-
-User: "sort by age and show top 3"
-You: Action: python_repl_ast
-Action Input: df.sort_values('age', ascending=False).head(3)
-Observation: [actual dataframe returned]
-Final Answer: [return the dataframe, not its string representation]
-
-NEVER DO THIS:
-User: "show data"
-You: "Here is the data: [description]"  ❌ WRONG
-
-ALWAYS DO THIS:
-User: "show data"  
-You: [execute code, return actual dataframe object]  ✅ CORRECT
-
-Remember: Return ACTUAL DATA OBJECTS, not string descriptions or print outputs!"""
+            prefix=_AGENT_PREFIX
         )
     
-    def query(self, question: str) -> Dict[str, any]:
+    def _resolve_locally(self, question: str, normalized: str = None):
+        """
+        Run the layers that need no LLM: normalization, the deterministic
+        fast paths and the result cache. Callers that already normalized
+        the question (the UI does, for the "Interpreted as" hint) pass it
+        in to avoid doing the work twice.
+        Returns (response_or_None, question, question_lower).
+        """
+        # Normalize the query to handle common patterns
+        if normalized is None:
+            normalized = normalize_query(question)
+
+        # If normalization changed the query significantly, use normalized version
+        if normalized != question and len(normalized) > len(question) * 0.7:
+            question = normalized
+
+        # Trivial queries are deterministic after normalization: answer
+        # them straight from the dataframe and skip the LLM entirely.
+        question_lower = question.lower()
+        for pattern, handler in _FAST_PATHS:
+            match = pattern.match(question_lower)
+            if match:
+                fast_result = handler(self.df, match)
+                if fast_result is not None:
+                    return {
+                        'success': True,
+                        'result': fast_result,
+                        'error': None
+                    }, question, question_lower
+                break
+
+        # Repeat queries against the same schema skip the network too.
+        cached = self._cache.get((self._df_fp, question_lower))
+        if cached is not None:
+            self._cache.move_to_end((self._df_fp, question_lower))
+            return cached, question, question_lower
+
+        return None, question, question_lower
+
+    def _enhance_question(self, question: str, question_lower: str) -> str:
+        """Build the question actually sent to the agent."""
+        # Enhance question to ensure we get data back
+        if any(word in question_lower for word in _DATA_REQUEST_WORDS):
+            enhanced_question = question
+        else:
+            enhanced_question = f"Show me: {question}"
+
+        # Inline the schema so the agent skips a df.head() round-trip.
+        # For wide frames, project to columns the question mentions.
+        if self._schema_lines:
+            if len(self._schema_lines) <= 30:
+                schema_lines = list(self._schema_lines.values())
+            else:
+                # Same tokenizer as _column_tokens so an underscored column
+                # name in the question splits the same way its tokens did
+                question_tokens = set(_NAME_TOKEN.findall(question_lower))
+                schema_lines = [
+                    line for col, line in self._schema_lines.items()
+                    if question_tokens & self._column_tokens[col]
+                ] or list(self._schema_lines.values())
+            enhanced_question = enhanced_question + "\n\nColumns of df:\n" + "\n".join(schema_lines)
+
+        return enhanced_question
+
+    def _remember(self, question_lower: str, response: Dict):
+        """Store a successful response in the LRU result cache."""
+        self._cache[(self._df_fp, question_lower)] = response
+        while len(self._cache) > _QUERY_CACHE_SIZE:
+            self._cache.popitem(last=False)
+
+    def _clean_error(self, error_msg: str) -> str:
+        """Rewrite raw exception text into something actionable for the UI."""
+        if "Could not parse LLM output" in error_msg:
+            error_msg = "The AI is having trouble understanding this query. Try using simpler phrasing like 'show first 5 rows' or 'calculate average salary'."
+        elif "column" in error_msg.lower() and "not found" in error_msg.lower():
+            error_msg = f"Column not found. Available columns are: {', '.join(self.df.columns.tolist())}"
+        elif "parsing" in error_msg.lower():
+            error_msg = "Query format issue. Try rephrasing more simply, like 'show rows where salary > 80000'."
+        elif len(error_msg) > 200:
+            # Truncate very long error messages
+            error_msg = error_msg[:200] + "... (Try a simpler query)"
+        return error_msg
+
+    def _extract_output(self, result):
+        """
+        Pull the final answer out of an executor result and clean it up:
+        recover the raw object from the last tool step when the answer got
+        stringified, rewrite the executor's stop message, and replace
+        empty output with a placeholder.
+        Returns (output, cacheable); stopped and empty outputs are not
+        worth replaying from the result cache, so cacheable is False.
+        """
+        cacheable = True
+
+        # Extract the actual output - handle multiple formats
+        if isinstance(result, dict):
+            if 'output' in result:
+                output = result['output']
+            elif 'result' in result:
+                output = result['result']
+            else:
+                # Return the whole dict if no specific output key
+                output = result
+        else:
+            output = result
+
+        # The agent sometimes returns str(dataframe) instead of the
+        # dataframe itself. Rather than sniffing the string, prefer the
+        # raw object from the last executed tool step -- but only when the
+        # answer really is that object stringified, so interpretive prose
+        # answers built on top of an inspection step survive.
+        if isinstance(output, str) and isinstance(result, dict):
+            steps = result.get('intermediate_steps')
+            if steps:
+                last_observation = steps[-1][1]
+                if last_observation is not None and not isinstance(last_observation, str):
+                    observation_str = str(last_observation).strip()
+                    if observation_str and observation_str in output.strip():
+                        output = last_observation
+
+        # When the step/time cap fires, say so instead of echoing the
+        # executor's generic stop message
+        if isinstance(output, str) and output.startswith('Agent stopped'):
+            steps = result.get('intermediate_steps') if isinstance(result, dict) else None
+            output = (
+                f"The agent gave up after {len(steps) if steps else 0} steps - "
+                "try rephrasing the question more simply."
+            )
+            cacheable = False
+
+        # Check if output is empty string or None
+        if output is None or (isinstance(output, str) and not output.strip()):
+            output = "Query executed successfully but returned no output."
+            cacheable = False
+
+        return output, cacheable
+
+    def stream(self, question: str, normalized: str = None):
+        """
+        Stream the answer for a query as chunks suitable for st.write_stream.
+        Fast-path and cached answers are yielded as a single chunk. On the
+        LLM path, each pandas expression the agent decides to run is yielded
+        as a progress line while its round-trip is in flight, and the final
+        answer -- run through the same post-processing as query() -- comes
+        last. After the generator is exhausted, self.last_result holds the
+        same dict query() would have returned, for logging.
+        """
+        if self.agent is None:
+            self.last_result = {
+                'success': False,
+                'result': None,
+                'error': 'Agent not initialized. Please upload a CSV first.'
+            }
+            return
+
+        try:
+            local, question, question_lower = self._resolve_locally(question, normalized)
+            if local is not None:
+                self.last_result = local
+                yield local['result']
+                return
+
+            enhanced_question = self._enhance_question(question, question_lower)
+
+            # AgentExecutor.stream yields an 'actions' chunk when the LLM
+            # picks a tool call, a 'steps' chunk once it has executed, and
+            # 'output' only in the final chunk. Paint the actions as
+            # progress lines and collect the steps so _extract_output can
+            # recover the raw object, exactly as on the query() path.
+            final_output = None
+            steps = []
+            for chunk in self.agent.stream(enhanced_question):
+                if not isinstance(chunk, dict):
+                    continue
+                for action in chunk.get('actions', ()):
+                    tool_input = getattr(action, 'tool_input', None)
+                    if tool_input:
+                        yield f"Running `{tool_input}` ...\n\n"
+                for step in chunk.get('steps', ()):
+                    steps.append((step.action, step.observation))
+                if 'output' in chunk:
+                    final_output = chunk['output']
+
+            output, cacheable = self._extract_output({
+                'output': final_output,
+                'intermediate_steps': steps
+            })
+
+            response = {
+                'success': True,
+                'result': output,
+                'error': None
+            }
+            if cacheable:
+                self._remember(question_lower, response)
+            self.last_result = response
+            yield output
+
+        except Exception as e:
+            self.last_result = {
+                'success': False,
+                'result': None,
+                'error': self._clean_error(str(e))
+            }
+
+    def query(self, question: str, normalized: str = None) -> Dict[str, any]:
         """
         Execute a natural language query against the dataframe.
         Returns dict with 'success', 'result', and optional 'error'.
@@ -234,70 +514,34 @@ Remember: Return ACTUAL DATA OBJECTS, not string descriptions or print outputs!"
                 'result': None,
                 'error': 'Agent not initialized. Please upload a CSV first.'
             }
-        
+
         try:
-            # Normalize the query to handle common patterns
-            normalized_question = normalize_query(question)
-            
-            # If normalization changed the query significantly, use normalized version
-            if normalized_question != question and len(normalized_question) > len(question) * 0.7:
-                question = normalized_question
-            
-            # Enhance question to ensure we get data back
-            if any(word in question.lower() for word in ['show', 'display', 'get', 'find', 'sort', 'filter', 'calculate']):
-                enhanced_question = question
-            else:
-                enhanced_question = f"Show me: {question}"
-            
+            local, question, question_lower = self._resolve_locally(question, normalized)
+            if local is not None:
+                return local
+
+            enhanced_question = self._enhance_question(question, question_lower)
+
             result = self.agent.invoke(enhanced_question)
-            
-            # Extract the actual output - handle multiple formats
-            if isinstance(result, dict):
-                if 'output' in result:
-                    output = result['output']
-                elif 'result' in result:
-                    output = result['result']
-                else:
-                    # Return the whole dict if no specific output key
-                    output = result
-            else:
-                output = result
-            
-            # IMPORTANT: Check if output is a string that looks like a DataFrame
-            # The agent sometimes returns str(dataframe) instead of the dataframe itself
-            if isinstance(output, str) and 'employee_name' in output and '\n' in output:
-                # This might be a stringified DataFrame - try to parse it back
-                # For now, just return it as-is but flag it
-                pass  # We'll handle display in the UI
-            
-            # Check if output is empty string or None
-            if output is None or (isinstance(output, str) and not output.strip()):
-                output = "Query executed successfully but returned no output."
-            
-            return {
+
+            output, cacheable = self._extract_output(result)
+
+            response = {
                 'success': True,
                 'result': output,
                 'error': None
             }
-            
+
+            if cacheable:
+                self._remember(question_lower, response)
+
+            return response
+
         except Exception as e:
-            error_msg = str(e)
-            
-            # Clean up error messages for better UX
-            if "Could not parse LLM output" in error_msg:
-                error_msg = "The AI is having trouble understanding this query. Try using simpler phrasing like 'show first 5 rows' or 'calculate average salary'."
-            elif "column" in error_msg.lower() and "not found" in error_msg.lower():
-                error_msg = f"Column not found. Available columns are: {', '.join(self.df.columns.tolist())}"
-            elif "parsing" in error_msg.lower():
-                error_msg = "Query format issue. Try rephrasing more simply, like 'show rows where salary > 80000'."
-            elif len(error_msg) > 200:
-                # Truncate very long error messages
-                error_msg = error_msg[:200] + "... (Try a simpler query)"
-            
             return {
                 'success': False,
                 'result': None,
-                'error': error_msg
+                'error': self._clean_error(str(e))
             }
     
     def get_dataframe(self) -> Optional[pd.DataFrame]:
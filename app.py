@@ -1,7 +1,7 @@
+import hashlib
+
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 from utils import load_csv_file, get_dataframe_summary, validate_dataframe
 from agent import DataAnalysisAgent, normalize_query
 from tracker import QueryTracker
@@ -26,6 +26,14 @@ def initialize_session_state():
         st.session_state.agent = None
     if 'data_loaded' not in st.session_state:
         st.session_state.data_loaded = False
+    if 'summary' not in st.session_state:
+        st.session_state.summary = None
+    if 'dtype_df' not in st.session_state:
+        st.session_state.dtype_df = None
+    if 'summary_key' not in st.session_state:
+        st.session_state.summary_key = None
+    if 'current_file_hash' not in st.session_state:
+        st.session_state.current_file_hash = None
 
 
 def render_sidebar():
@@ -100,41 +108,67 @@ def render_data_upload():
     )
     
     if uploaded_file:
-        with st.spinner("Loading CSV..."):
-            df = load_csv_file(uploaded_file)
-            
-            if df is not None:
-                is_valid, error_msg = validate_dataframe(df)
-                
-                if is_valid:
-                    st.session_state.df = df
-                    st.session_state.data_loaded = True
-                    st.success(f"✓ Loaded {len(df)} rows and {len(df.columns)} columns")
-                    
-                    # Show preview
-                    with st.expander("📋 Data Preview", expanded=True):
-                        st.dataframe(df.head(), use_container_width=True)
-                    
-                    # Show summary stats
-                    with st.expander("📈 Summary Statistics"):
-                        summary = get_dataframe_summary(df)
-                        
-                        col1, col2, col3 = st.columns(3)
-                        col1.metric("Rows", summary['num_rows'])
-                        col2.metric("Columns", summary['num_columns'])
-                        col3.metric("Memory (MB)", f"{summary['memory_usage']:.2f}")
-                        
-                        st.write("**Column Types:**")
-                        dtype_df = pd.DataFrame({
-                            'Column': summary['columns'],
-                            'Type': [str(summary['dtypes'][col]) for col in summary['columns']],
-                            'Missing': [summary['missing_values'][col] for col in summary['columns']]
-                        })
-                        st.dataframe(dtype_df, use_container_width=True)
-                else:
-                    st.error(f"Invalid dataframe: {error_msg}")
-            else:
+        # The uploader widget re-triggers on every rerun while a file is
+        # selected; hash the bytes and only re-parse when they change.
+        # blake2b is the fastest hash in the stdlib for payloads this size.
+        file_hash = hashlib.blake2b(uploaded_file.getvalue(), digest_size=16).hexdigest()
+
+        if file_hash != st.session_state.current_file_hash:
+            with st.spinner("Loading CSV..."):
+                df = load_csv_file(uploaded_file)
+
+            if df is None:
                 st.error("Failed to load CSV. Check file encoding.")
+                return
+
+            is_valid, error_msg = validate_dataframe(df)
+            if not is_valid:
+                st.error(f"Invalid dataframe: {error_msg}")
+                return
+
+            st.session_state.df = df
+            st.session_state.data_loaded = True
+            st.session_state.current_file_hash = file_hash
+
+            # Rebind an existing agent to the new dataframe (the LLM
+            # client inside it is reused)
+            if st.session_state.agent is not None:
+                st.session_state.agent.initialize_agent(df)
+
+        df = st.session_state.df
+        st.success(f"✓ Loaded {len(df)} rows and {len(df.columns)} columns")
+
+        # Show preview
+        with st.expander("📋 Data Preview", expanded=True):
+            st.dataframe(df.head(), use_container_width=True)
+
+        # The summary never changes for a loaded CSV but the
+        # script reruns on every widget interaction; compute it (and the
+        # dtype table) once per uploaded file. Keyed on the file hash, not
+        # shape/columns, so an edited file with the same schema doesn't
+        # show the previous file's counts.
+        summary_key = st.session_state.current_file_hash
+        if st.session_state.summary_key != summary_key:
+            summary = get_dataframe_summary(df)
+            st.session_state.summary = summary
+            st.session_state.dtype_df = pd.DataFrame({
+                'Column': summary['columns'],
+                'Type': [str(summary['dtypes'][col]) for col in summary['columns']],
+                'Missing': [summary['missing_values'][col] for col in summary['columns']]
+            })
+            st.session_state.summary_key = summary_key
+
+        # Show summary stats
+        with st.expander("📈 Summary Statistics"):
+            summary = st.session_state.summary
+
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Rows", summary['num_rows'])
+            col2.metric("Columns", summary['num_columns'])
+            col3.metric("Memory (MB)", f"{summary['memory_usage']:.2f}")
+
+            st.write("**Column Types:**")
+            st.dataframe(st.session_state.dtype_df, use_container_width=True)
 
 
 def render_query_interface(api_key: str):
@@ -205,83 +239,42 @@ def render_query_interface(api_key: str):
         if normalized != question and len(normalized) > len(question) * 0.7:
             st.info(f"🔄 Interpreted as: *{normalized}*")
         
-        with st.spinner("Analyzing..."):
-            result = st.session_state.agent.query(question)
-            
-            # Log the query
-            tracker.log_query(
-                query=question,
-                success=result['success'],
-                error_msg=result.get('error')
-            )
-            
-            # Display results
-            if result['success']:
-                st.success("✓ Analysis complete!")
-                
+        # Stream the answer so output paints as the agent produces it,
+        # instead of blocking behind a spinner until completion.
+        # Fast-path answers (dataframes, numbers) arrive as a single chunk
+        # and are rendered by st.write_stream via st.write.
+        st.write("**Result:**")
+        st.write_stream(st.session_state.agent.stream(question, normalized=normalized))
+        result = st.session_state.agent.last_result
+
+        # Log the query
+        tracker.log_query(
+            query=question,
+            success=result['success'],
+            error_msg=result.get('error')
+        )
+
+        if result['success']:
+            st.success("✓ Analysis complete!")
+
+            # Debug mode
+            if debug_mode:
                 output = result['result']
-                
-                # Debug mode
-                if debug_mode:
-                    with st.expander("🔍 Debug Info", expanded=True):
-                        st.write(f"**Result Type:** `{type(output).__name__}`")
-                        st.write(f"**Result Value:** `{repr(output)}`")
-                        if hasattr(output, '__len__'):
-                            st.write(f"**Length:** {len(output)}")
-                
-                st.write("**Result:**")
-                
-                # Handle different output types
-                if isinstance(output, pd.DataFrame):
-                    st.dataframe(output, use_container_width=True)
-                elif isinstance(output, pd.Series):
-                    # Convert Series to DataFrame for better display
-                    series_df = output.to_frame()
-                    # If index has a name, use it; otherwise call it 'Index'
-                    if series_df.index.name is None:
-                        series_df.index.name = 'Category'
-                    # If column has no name, use the series name or 'Value'
-                    if series_df.columns[0] is None or series_df.columns[0] == 0:
-                        series_df.columns = [output.name if output.name else 'Value']
-                    st.dataframe(series_df, use_container_width=True)
-                elif isinstance(output, (int, float)):
-                    st.metric("Answer", output)
-                elif isinstance(output, list):
-                    st.write(output)
-                elif isinstance(output, dict):
-                    st.json(output)
-                elif output is None or str(output).strip() == "":
-                    st.warning("⚠️ The query completed but returned no visible output. Try rephrasing your question.")
-                else:
-                    # For string or other types
-                    result_str = str(output).strip()
-                    
-                    # Check if this looks like a DataFrame string representation
-                    # (has column names in first line and data rows)
-                    lines = result_str.split('\n')
-                    if len(lines) > 2 and any(col in lines[0] for col in ['employee_name', 'department', 'salary', 'age']):
-                        # This is likely a DataFrame that got stringified
-                        st.warning("⚠️ Result is showing as text. The data is correct but formatting failed.")
-                        st.text(result_str)
-                        st.info("💡 The query worked! Try enabling Debug Mode to see the raw data type.")
-                    elif 'dtype:' in result_str and '\n' in result_str:
-                        # Series string representation
-                        st.text(result_str)
-                        st.info("💡 Tip: The result is shown above. For better formatting, try rephrasing as 'show as a table' or 'display as dataframe'")
-                    elif result_str:
-                        st.write(result_str)
-                    else:
-                        st.warning("⚠️ The query completed but returned an empty result.")
+                with st.expander("🔍 Debug Info", expanded=True):
+                    st.write(f"**Result Type:** `{type(output).__name__}`")
+                    st.write(f"**Result Value:** `{repr(output)}`")
+                    if hasattr(output, '__len__'):
+                        st.write(f"**Length:** {len(output)}")
+        else:
+            st.error(f"❌ Error: {result['error']}")
+
+            # Show helpful suggestions based on error type
+            if "parse" in result['error'].lower() or "format" in result['error'].lower():
+                st.info("💡 **Try these working queries instead:**\n- `show all rows`\n- `calculate average salary`\n- `show first 10 rows`")
+            elif "column" in result['error'].lower():
+                st.info(f"💡 **Available columns:** {', '.join(st.session_state.df.columns.tolist())}")
             else:
-                st.error(f"❌ Error: {result['error']}")
-                
-                # Show helpful suggestions based on error type
-                if "parse" in result['error'].lower() or "format" in result['error'].lower():
-                    st.info("💡 **Try these working queries instead:**\n- `show all rows`\n- `calculate average salary`\n- `show first 10 rows`")
-                elif "column" in result['error'].lower():
-                    st.info(f"💡 **Available columns:** {', '.join(st.session_state.df.columns.tolist())}")
-                else:
-                    st.info("💡 Try rephrasing with 'show', 'calculate', or 'display' at the start")
+                st.info("💡 Try rephrasing with 'show', 'calculate', or 'display' at the start")
 
 
 def main():
@@ -1,18 +1,30 @@
+from collections import deque
 from datetime import datetime
 from typing import List, Dict
 import streamlit as st
 
 
+# The UI only ever shows the last handful of queries, so keep the
+# history bounded instead of growing for the whole session
+_HISTORY_MAX = 100
+
+
 class QueryTracker:
     """
     Simple tracker for monitoring query success/failure rates.
-    Stores data in Streamlit session state.
+    Stores data in Streamlit session state. Counters are maintained
+    incrementally so the sidebar stats don't rescan the whole history
+    on every Streamlit rerun.
     """
-    
+
     def __init__(self):
         if 'query_history' not in st.session_state:
-            st.session_state.query_history = []
-    
+            st.session_state.query_history = deque(maxlen=_HISTORY_MAX)
+        if 'query_success_count' not in st.session_state:
+            st.session_state.query_success_count = 0
+        if 'query_fail_count' not in st.session_state:
+            st.session_state.query_fail_count = 0
+
     def log_query(self, query: str, success: bool, error_msg: str = None):
         """
         Log a query attempt with timestamp and outcome.
@@ -24,33 +36,39 @@ class QueryTracker:
             'error': error_msg
         }
         st.session_state.query_history.append(entry)
-    
+        if success:
+            st.session_state.query_success_count += 1
+        else:
+            st.session_state.query_fail_count += 1
+
     def get_success_rate(self) -> float:
         """
         Calculate percentage of successful queries.
         """
-        if not st.session_state.query_history:
+        successful = st.session_state.query_success_count
+        total = successful + st.session_state.query_fail_count
+        if total == 0:
             return 0.0
-        
-        successful = sum(1 for q in st.session_state.query_history if q['success'])
-        total = len(st.session_state.query_history)
-        
+
         return (successful / total) * 100
-    
+
     def get_total_queries(self) -> int:
         """Return total number of queries."""
-        return len(st.session_state.query_history)
-    
+        return st.session_state.query_success_count + st.session_state.query_fail_count
+
     def get_recent_queries(self, n: int = 5) -> List[Dict]:
         """
         Get the n most recent queries.
         """
-        return st.session_state.query_history[-n:]
-    
+        history = st.session_state.query_history
+        return list(history)[-n:]
+
     def clear_history(self):
         """Reset query history."""
-        st.session_state.query_history = []
-    
+        st.session_state.query_history = deque(maxlen=_HISTORY_MAX)
+        st.session_state.query_success_count = 0
+        st.session_state.query_fail_count = 0
+
     def get_failure_queries(self) -> List[Dict]:
         """
         Return all failed queries for debugging.